@@ -5,7 +5,7 @@ import numpy as np
 from datetime import datetime
 from collections import deque
 from ollama_client import generate_embedding, generate_response
-from faiss_client import store_document_in_faiss, retrieve_document_from_faiss
+from faiss_client import store_document_in_faiss, retrieve_document_from_faiss, score_to_confidence
 import re
 import threading
 import tempfile
@@ -189,7 +189,7 @@ def chat():
             "reply": response,
             "sources": [doc[0] for doc in documents],
             "timestamps": [get_document_timestamp(doc[0]) for doc in documents],
-            "confidence_scores": [float(1/(1+d)) for d in distances[0]] if distances else []
+            "confidence_scores": [float(score_to_confidence(d)) for d in distances[0]] if distances else []
         })
         
     except Exception as e:
@@ -0,0 +1,270 @@
+"""Offline retrieval evaluation.
+
+Replays a recorded query set against one or two snapshots of
+faiss_index.index / faiss_meta.pkl and reports recall@k, MRR and per-query
+latency percentiles for each retrieval configuration, side by side.
+
+Query set format (JSON Lines, one query per line):
+    {"query": "What is the Q4 target?", "expected_ids": ["finance_notes"]}
+
+Examples:
+    python evaluate_retrieval.py --queries queries.jsonl --snapshot snapshots/before snapshots/after
+    python evaluate_retrieval.py --queries queries.jsonl --snapshot . --top-k 3 5 --overfetch 2 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from faiss_client import DIMENSION, INDEX_FILE, META_FILE, FaissDocumentStore, score_to_confidence
+from ollama_client import generate_embedding
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def hash_embedding(text):
+    """Deterministic bag-of-words embedding used in place of Ollama.
+
+    Each lowercased token is hashed to a bucket and a sign, so texts sharing
+    vocabulary end up close under cosine similarity. The result is stable
+    across runs and machines.
+    """
+    vector = np.zeros(DIMENSION, dtype="float32")
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        bucket = int.from_bytes(digest[:4], "little") % DIMENSION
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[bucket] += sign
+    return vector.tolist()
+
+
+def ollama_embedding(text):
+    """Live Ollama embedding that fails loudly instead of returning zeros.
+
+    Calls the undecorated function so every timed query pays for its own
+    embedding rather than hitting the lru_cache.
+    """
+    embedding = np.asarray(generate_embedding.__wrapped__(text), dtype="float32")
+    if embedding.shape != (DIMENSION,) or not embedding.any():
+        raise RuntimeError("Ollama returned no usable embedding - is the server running?")
+    return embedding.tolist()
+
+
+EMBEDDERS = {
+    "hash": hash_embedding,
+    "ollama": ollama_embedding,
+}
+
+
+def load_query_set(path):
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "query" not in record or "expected_ids" not in record:
+                raise ValueError(f"{path}:{line_no}: expected 'query' and 'expected_ids' fields")
+            expected = record["expected_ids"]
+            if isinstance(expected, str):
+                expected = [expected]
+            if not expected:
+                raise ValueError(f"{path}:{line_no}: 'expected_ids' must not be empty")
+            queries.append({"query": record["query"], "expected_ids": set(expected)})
+    if not queries:
+        raise ValueError(f"{path}: query set is empty")
+    return queries
+
+
+def load_snapshot(snapshot_dir, embed_fn, reembed=False):
+    index_file = os.path.join(snapshot_dir, INDEX_FILE)
+    meta_file = os.path.join(snapshot_dir, META_FILE)
+    for path in (index_file, meta_file):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot file not found: {path}")
+
+    store = FaissDocumentStore(index_file=index_file, meta_file=meta_file, embed_fn=embed_fn, strict=True)
+    if store.index.metric_type != faiss.METRIC_INNER_PRODUCT:
+        raise ValueError(f"{index_file}: only inner-product indexes are supported")
+    if reembed:
+        reembed_index(store)
+    return store
+
+
+def reembed_index(store):
+    """Rebuild the store's vectors from the stored document texts.
+
+    Vectors keep their original positions so the doc_id mapping stays valid.
+    Positions no longer referenced by any document (left behind by updates)
+    have no text to embed and are filled with zero vectors. Those always score
+    0, which can tie with or beat live documents on poorly matching queries
+    (hash-embedded documents can score below 0), while in production a stale
+    vector keeps its real embedding. Over-fetch results on a re-embedded
+    snapshot with orphans are therefore not representative; over-fetch is only
+    meaningfully compared with --embedder ollama and without --reembed. See
+    count_orphaned_positions.
+    """
+    position_to_doc = {pos: doc_id for doc_id, pos in store.doc_id_to_index.items()}
+    total = max([store.index.ntotal] + [pos + 1 for pos in position_to_doc])
+
+    vectors = np.zeros((total, DIMENSION), dtype="float32")
+    for pos, doc_id in position_to_doc.items():
+        if doc_id in store.document_metadata:
+            vectors[pos] = store.embed_fn(store.document_metadata[doc_id]["text"])
+    faiss.normalize_L2(vectors)
+
+    index = faiss.IndexFlatIP(DIMENSION)
+    index.add(vectors)
+    store.index = index
+    store.next_index = total
+
+
+def count_orphaned_positions(store):
+    """Number of index positions not mapped to a live document"""
+    live = {pos for doc_id, pos in store.doc_id_to_index.items() if doc_id in store.document_metadata}
+    return store.index.ntotal - len(live)
+
+
+def evaluate(store, queries, top_k, overfetch, repeat=1):
+    recalls = []
+    reciprocal_ranks = []
+    confidences = []
+    latencies_ms = []
+
+    for item in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = store.retrieve_documents(item["query"], top_k=top_k, overfetch=overfetch)
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        retrieved = [doc[0] for doc in results][:top_k]
+        expected = item["expected_ids"]
+
+        hits = expected.intersection(retrieved)
+        recalls.append(len(hits) / len(expected))
+
+        rank = next((i for i, doc_id in enumerate(retrieved, 1) if doc_id in expected), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+        if results:
+            confidences.append(score_to_confidence(results[0][2]))
+
+    latencies = np.array(latencies_ms)
+    return {
+        "queries": len(queries),
+        "recall@k": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "top1_confidence": float(np.mean(confidences)) if confidences else 0.0,
+        "empty_results": len(queries) - len(confidences),
+        "orphaned_positions": count_orphaned_positions(store),
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p90_ms": float(np.percentile(latencies, 90)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "latency_max_ms": float(latencies.max()),
+    }
+
+
+def build_configs(snapshots, top_ks, overfetches):
+    count = max(len(snapshots), len(top_ks), len(overfetches))
+    if count > 2:
+        raise ValueError("At most two configurations can be compared")
+    for name, values in (("--snapshot", snapshots), ("--top-k", top_ks), ("--overfetch", overfetches)):
+        if len(values) not in (1, count):
+            raise ValueError(f"{name} takes one value or one per configuration ({count})")
+
+    def pick(values, i):
+        return values[i] if len(values) == count else values[0]
+
+    return [
+        {
+            "name": "A" if i == 0 else "B",
+            "snapshot": pick(snapshots, i),
+            "top_k": pick(top_ks, i),
+            "overfetch": pick(overfetches, i),
+        }
+        for i in range(count)
+    ]
+
+
+def print_report(configs, reports):
+    rows = [("snapshot", [c["snapshot"] for c in configs]),
+            ("top_k", [c["top_k"] for c in configs]),
+            ("overfetch", [c["overfetch"] for c in configs])]
+    for name in reports[0]:
+        rows.append((name, [report[name] for report in reports]))
+
+    def fmt(value):
+        if isinstance(value, float):
+            return f"{value:.4f}"
+        return str(value)
+
+    label_width = max(len(label) for label, _ in rows)
+    col_width = max(12, max(len(fmt(v)) for _, values in rows for v in values))
+    header = " " * label_width + "".join(f"  {c['name']:>{col_width}}" for c in configs)
+    print(header)
+    print("-" * len(header))
+    for label, values in rows:
+        print(f"{label:<{label_width}}" + "".join(f"  {fmt(v):>{col_width}}" for v in values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate FAISS retrieval quality and latency offline")
+    parser.add_argument("--queries", required=True, help="JSONL file of recorded queries and expected doc_ids")
+    parser.add_argument("--snapshot", nargs="+", default=["."],
+                        help=f"Directory holding {INDEX_FILE} and {META_FILE} (one, or two to compare)")
+    parser.add_argument("--top-k", nargs="+", type=int, default=[3], help="top_k per configuration")
+    parser.add_argument("--overfetch", nargs="+", type=int, default=[2], help="Over-fetch factor per configuration")
+    parser.add_argument("--embedder", choices=sorted(EMBEDDERS), default="hash",
+                        help="'hash' is a local deterministic stand-in; 'ollama' uses the live embedding model")
+    parser.add_argument("--reembed", action="store_true",
+                        help="Re-embed snapshot documents with the chosen embedder (always on for 'hash')")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to run each query for latency sampling")
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if any(k < 1 for k in args.top_k):
+        parser.error("--top-k values must be at least 1")
+    if any(f < 1 for f in args.overfetch):
+        parser.error("--overfetch values must be at least 1")
+
+    try:
+        configs = build_configs(args.snapshot, args.top_k, args.overfetch)
+    except ValueError as e:
+        parser.error(str(e))
+
+    embed_fn = EMBEDDERS[args.embedder]
+    # Stored vectors come from the Ollama model, so the stand-in must embed both sides itself
+    reembed = args.reembed or args.embedder == "hash"
+
+    try:
+        queries = load_query_set(args.queries)
+        reports = []
+        for config in configs:
+            store = load_snapshot(config["snapshot"], embed_fn, reembed=reembed)
+            reports.append(evaluate(store, queries, config["top_k"], config["overfetch"], args.repeat))
+    except Exception as e:
+        print(f"Evaluation failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print_report(configs, reports)
+    if reembed and any(report["orphaned_positions"] for report in reports):
+        print("\nNote: orphaned positions were re-embedded as zero vectors, which can rank "
+              "arbitrarily against live documents. Over-fetch numbers here do not reflect "
+              "production; compare over-fetch with --embedder ollama and without --reembed.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump([{"config": c, "metrics": r} for c, r in zip(configs, reports)], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import faiss
 import numpy as np
 import os
 import pickle
+import sys
+import threading
 from datetime import datetime
 from ollama_client import generate_embedding
 
@@ -13,7 +15,11 @@ MAX_DOCS_IN_MEMORY = 1000
 SAVE_INTERVAL = 50
 
 class FaissDocumentStore:
-    def __init__(self):
+    def __init__(self, index_file=INDEX_FILE, meta_file=META_FILE, embed_fn=generate_embedding, strict=False):
+        self.index_file = index_file
+        self.meta_file = meta_file
+        self.embed_fn = embed_fn  # Swappable so offline tools can run without Ollama
+        self.strict = strict  # Re-raise load/retrieval errors instead of degrading to empty results
         self.index = None
         self.document_metadata = {}
         self.doc_id_to_index = {}  # Maps doc_id to FAISS index position
@@ -23,12 +29,12 @@ class FaissDocumentStore:
 
     def load_index(self):
         try:
-            if os.path.exists(INDEX_FILE):
-                self.index = faiss.read_index(INDEX_FILE)
+            if os.path.exists(self.index_file):
+                self.index = faiss.read_index(self.index_file)
                 self.next_index = self.index.ntotal
             
-            if os.path.exists(META_FILE):
-                with open(META_FILE, "rb") as f:
+            if os.path.exists(self.meta_file):
+                with open(self.meta_file, "rb") as f:
                     data = pickle.load(f)
                     self.document_metadata = data.get("metadata", {})
                     self.doc_id_to_index = data.get("id_map", {})
@@ -36,8 +42,12 @@ class FaissDocumentStore:
             if self.index is None:
                 self.index = faiss.IndexFlatIP(DIMENSION)  # Using Inner Product for similarity
             
-            print(f"Loaded index with {len(self.document_metadata)} documents")
+            # Keep stdout clean for tools that print reports from a strict store
+            print(f"Loaded index with {len(self.document_metadata)} documents",
+                  file=sys.stderr if self.strict else sys.stdout)
         except Exception as e:
+            if self.strict:
+                raise
             print(f"Error loading index: {e}")
             self._initialize_new_index()
 
@@ -50,8 +60,8 @@ class FaissDocumentStore:
 
     def save_index(self):
         try:
-            faiss.write_index(self.index, INDEX_FILE)
-            with open(META_FILE, "wb") as f:
+            faiss.write_index(self.index, self.index_file)
+            with open(self.meta_file, "wb") as f:
                 pickle.dump({
                     "metadata": self.document_metadata,
                     "id_map": self.doc_id_to_index
@@ -81,7 +91,7 @@ class FaissDocumentStore:
             self._save_document_to_disk(doc_id, text, timestamp)
             
             # Generate embedding and add to index
-            embedding = generate_embedding(text)
+            embedding = self.embed_fn(text)
             if len(embedding) != DIMENSION:
                 raise ValueError(f"Invalid embedding dimension: {len(embedding)}")
                 
@@ -113,14 +123,14 @@ class FaissDocumentStore:
             f.write(f"TIMESTAMP:{timestamp}\n")
             f.write(text)
 
-    def retrieve_documents(self, query, top_k=3):
+    def retrieve_documents(self, query, top_k=3, overfetch=2):
         try:
-            query_embedding = generate_embedding(query)
+            query_embedding = self.embed_fn(query)
             query_embedding = np.array(query_embedding).astype('float32').reshape(1, -1)
             faiss.normalize_L2(query_embedding)
             
             # Search with larger k to account for potential empty results
-            distances, indices = self.index.search(query_embedding, top_k*2)
+            distances, indices = self.index.search(query_embedding, top_k*overfetch)
             
             results = []
             seen_docs = set()
@@ -144,17 +154,32 @@ class FaissDocumentStore:
             
             return results
         except Exception as e:
+            if self.strict:
+                raise
             print(f"Error retrieving documents: {e}")
             return []
 
-# Global instance
-document_store = FaissDocumentStore()
+# Global instance, created on first use so importing this module has no side effects
+document_store = None
+_document_store_lock = threading.Lock()
+
+def get_document_store():
+    global document_store
+    with _document_store_lock:
+        if document_store is None:
+            document_store = FaissDocumentStore()
+    return document_store
 
 def store_document_in_faiss(text, doc_id):
-    return document_store.store_document(text, doc_id)
+    return get_document_store().store_document(text, doc_id)
 
 def retrieve_document_from_faiss(query, top_k=10):
-    results = document_store.retrieve_documents(query, top_k)
+    results = get_document_store().retrieve_documents(query, top_k)
     documents = [(doc[0], doc[1]) for doc in results]
     distances = [[doc[2] for doc in results]]
-    return documents, distances
\ No newline at end of file
+    return documents, distances
+
+def score_to_confidence(score):
+    """Map an inner-product score to a 0-1 confidence"""
+    # Embeddings are L2-normalised, so inner product is cosine similarity in [-1, 1]
+    return min(1.0, max(0.0, (1 + score) / 2))